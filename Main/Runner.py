@@ -6,14 +6,19 @@ class KitchenRunner:
         self.controller = KitchenController()
         self.controller.get_event("oven_power").observe(KitchenRunner.oven_status_observer)
         self.controller.get_event("oven_power").respond(KitchenRunner.oven_status_responder)
-        self.controller.get_event("master").observe(KitchenRunner.controller_watcher)
+        self.watcher_callback = self.controller.get_event("master").observe_batched(
+            KitchenRunner.controller_watcher, batch_size=50, window=5.0)
+        self.status_callback = self.controller.get_event("master").observe_batched(
+            KitchenRunner.latest_status_watcher, window=5.0, coalesce_key=EventBatchCallback.inner_event_name)
 
     def start(self):
         message = self.controller.set_oven_power(True)
         print(f"<Direct return from blocking function>: {message.to_string()}\n\n")
         message = self.controller.set_oven_power(True)
         print(f"<Direct return from blocking function>: {message.to_string()}\n\n")
-
+        self.watcher_callback.flush()
+        self.status_callback.flush()
+        self.controller.close()
 
     @staticmethod
     def oven_status_observer(message: EventMessage):
@@ -24,8 +29,15 @@ class KitchenRunner:
         print(f"<oven status responder>: {message.to_string()}\n\n")
 
     @staticmethod
-    def controller_watcher(message: EventMessage):
-        print(f'<controller watcher subscribed to master event>: {message.to_string()}\n\n')
+    def controller_watcher(messages: [EventMessage]):
+        for message in messages:
+            print(f'<controller watcher subscribed to master event>: {message.to_string()}\n\n')
+
+    @staticmethod
+    def latest_status_watcher(messages: [EventMessage]):
+        latest = ", ".join(f"{message.inner_message.event_name}: {message.inner_message.success}"
+                           for message in messages if message.inner_message)
+        print(f'<latest status per event>: {latest}\n\n')
 
 
 if __name__ == '__main__':
@@ -1,4 +1,5 @@
 import inspect
+import threading
 import time
 import uuid
 import textwrap
@@ -55,6 +56,73 @@ class EventCallback:
         self.callback(result)
 
 
+class EventBatchCallback(EventCallback):
+    """
+    Wrapper for callback methods from high frequency observers. Messages are buffered and handed to the callback as a
+    list once the batch size is reached or the time window since the first buffered message has elapsed. If a coalesce
+    key is given, a buffered message is replaced by a later one with the same key so only the latest is delivered, at
+    the position of its latest arrival.
+
+    Batches closed by the window are delivered from a timer thread, and the event callback lists are not thread safe,
+    so a batch callback must not invoke events itself.
+    """
+
+    def __init__(self, callback, batch_size=100, window=1.0, coalesce_key=None):
+        super().__init__(callback, invoke_once=False)
+        self.batch_size = batch_size
+        self.window = window
+        self.coalesce_key = coalesce_key
+        self.buffer = {}
+        self.timer = None
+        # guards the buffer and timer only, so producers never wait on a batch being delivered by the timer
+        self.lock = threading.Lock()
+        # keeps batches in order when the timer and a full buffer deliver at the same time
+        self.delivery_lock = threading.Lock()
+
+    def activate(self, result):
+        key = self.coalesce_key(result) if self.coalesce_key else None
+        if key is None:
+            key = result.id
+        with self.lock:
+            self.buffer.pop(key, None)
+            self.buffer[key] = result
+            full = len(self.buffer) >= self.batch_size
+            if not full and self.timer is None:
+                self.timer = threading.Timer(self.window, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+        if full:
+            self.flush()
+
+    def flush(self):
+        """
+        Deliver everything currently buffered as one batch. This happens on its own by size or window, call it to push
+        out a trailing partial batch right away (e.g. on shut down)
+        :return: None
+        """
+        with self.delivery_lock:
+            with self.lock:
+                if self.timer is not None:
+                    self.timer.cancel()
+                    self.timer = None
+                batch = list(self.buffer.values())
+                self.buffer = {}
+            if batch:
+                self.callback(batch)
+
+    @staticmethod
+    def inner_event_name(message: 'EventMessage') -> str:
+        """
+        Coalesce key for observers of fan in events (like master) that keeps the latest message per event feeding
+        directly into the observed event
+        :param message: message delivered to the observer
+        :return: name of the direct inner event, or the message's own event name if there is none
+        """
+        if message.inner_message:
+            return message.inner_message.event_name
+        return message.event_name
+
+
 class EventMessage:
     """
     Standard formatter and container for messaging, data, and exception information that comes back from events
@@ -145,6 +213,19 @@ class Event:
         """
         self.subscribe(EventCallback(callback_method, invoke_once=False))
 
+    def observe_batched(self, callback_method, batch_size=100, window=1.0, coalesce_key=None) -> EventBatchCallback:
+        """
+        set up a continual callback for the event that receives lists of messages instead of single messages
+        :param callback_method: method to invoke with each batch
+        :param batch_size: number of buffered messages that triggers delivery
+        :param window: seconds after the first buffered message that triggers delivery
+        :param coalesce_key: optional function of a message; messages with the same key replace each other
+        :return: the batch callback, so the observer can flush it
+        """
+        callback = EventBatchCallback(callback_method, batch_size=batch_size, window=window, coalesce_key=coalesce_key)
+        self.subscribe(callback)
+        return callback
+
     def respond(self, callback_method):
         """
         set up a one time callback for the event
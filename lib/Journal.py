@@ -0,0 +1,294 @@
+import json
+import mmap
+import os
+import time
+from bisect import bisect_left, bisect_right
+
+from Events import *
+
+__all__ = ["EventJournal"]
+
+
+class EventJournal:
+    """
+    Optional append-only record of event messages. Records are written as json lines to a bounded ring of segment files
+    in a directory and read back through mmap. An in memory index by event name, tag and time lets late subscribers
+    or restarted controllers resume from an offset and replay history in bulk instead of re-deriving it.
+    """
+    segment_suffix = ".seg"
+
+    def __init__(self, directory: str, segment_size=1024 * 1024, max_segments=8, sync=False):
+        if segment_size <= 0:
+            raise ValueError(f"[JOURNAL] segment_size must be positive. segment_size: {segment_size}")
+        if max_segments < 1:
+            raise ValueError(f"[JOURNAL] max_segments must be at least 1. max_segments: {max_segments}")
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+        # fsync every append, survives a machine crash rather than only a process crash
+        self.sync = sync
+        # first offset of each segment on disk, oldest first
+        self.segments = []
+        # offset -> (segment first offset, byte position, byte length)
+        self.positions = {}
+        self.names = {}
+        self.tags = {}
+        self.times = []
+        self.time_offsets = []
+        self.next_offset = 0
+        # the newest segment stays open for appending, its size is tracked here instead of asking the file system
+        self.active_file = None
+        self.active_size = 0
+        os.makedirs(directory, exist_ok=True)
+        self.load()
+
+    """
+    Writing
+    """
+
+    def attach(self, event: Event):
+        """
+        Record every future invocation of the event in the journal
+        :param event: event to observe
+        :return: None
+        """
+        tags = list(event.tags)
+        event.observe(lambda message: self.append(message, tags))
+
+    def append(self, message: EventMessage, tags=None) -> int:
+        """
+        Write a message to the end of the journal
+        :param message: message to record
+        :param tags: tags of the event the message came from
+        :return: offset of the new record
+        """
+        record = EventJournal.message_to_record(message, tags or [])
+        record["offset"] = self.next_offset
+        # never let the wall clock step back so the time index stays sorted
+        record["time"] = max(time.time(), self.times[-1]) if self.times else time.time()
+        line = (json.dumps(record, default=str) + "\n").encode("utf-8")
+
+        if self.active_file is None or self.active_size >= self.segment_size:
+            self.start_segment(self.next_offset)
+        segment = self.segments[-1]
+        position = self.active_size
+        self.active_file.write(line)
+        if self.sync:
+            os.fsync(self.active_file.fileno())
+        self.active_size += len(line)
+
+        self.index_record(record, segment, position, len(line))
+        self.next_offset += 1
+        return record["offset"]
+
+    def start_segment(self, first_offset: int):
+        self.close()
+        self.segments.append(first_offset)
+        self.open_active()
+        while len(self.segments) > self.max_segments:
+            self.drop_segment()
+
+    def open_active(self):
+        # unbuffered so every record reaches the file right away, for crashed processes and other readers alike
+        self.active_file = open(self.segment_path(self.segments[-1]), "ab", buffering=0)
+        self.active_size = self.active_file.tell()
+
+    def close(self):
+        if self.active_file is not None:
+            self.active_file.close()
+            self.active_file = None
+            self.active_size = 0
+
+    def drop_segment(self):
+        """
+        Remove the oldest segment from disk and forget everything indexed in it
+        :return: None
+        """
+        oldest = self.segments.pop(0)
+        os.remove(self.segment_path(oldest))
+        first_kept = self.segments[0] if self.segments else self.next_offset
+        for offset in range(oldest, first_kept):
+            self.positions.pop(offset, None)
+        for index in (self.names, self.tags):
+            for key in list(index.keys()):
+                offsets = index[key]
+                del offsets[:bisect_left(offsets, first_kept)]
+                if not offsets:
+                    del index[key]
+        cut = bisect_left(self.time_offsets, first_kept)
+        del self.times[:cut]
+        del self.time_offsets[:cut]
+
+    """
+    Reading
+    """
+
+    @property
+    def first_offset(self) -> int:
+        return self.segments[0] if self.segments else self.next_offset
+
+    def read(self, offset: int) -> {}:
+        """
+        Read a single record
+        :param offset: offset returned by append or found in a replayed record
+        :return: record dict, or None if the offset has been dropped from the ring or not written yet
+        """
+        return next(iter(self.read_offsets([offset])), None)
+
+    def replay(self, start=0, names=None, tags=None, since=None, until=None) -> []:
+        """
+        Read history in offset order. Filters combine, so a record must match all of the ones given
+        :param start: first offset to return, pass the offset after the last one seen to resume
+        :param names: only records from these event names
+        :param tags: only records from events carrying any of these tags
+        :param since: only records written at or after this time
+        :param until: only records written before this time
+        :return: list of record dicts
+        """
+        offsets = range(max(start, self.first_offset), self.next_offset)
+        if since is not None or until is not None:
+            low = bisect_left(self.times, since) if since is not None else 0
+            high = bisect_left(self.times, until) if until is not None else len(self.times)
+            offsets = EventJournal.filter_offsets(offsets, self.time_offsets[low:high])
+        if names:
+            offsets = EventJournal.filter_offsets(offsets, EventJournal.merge_index(self.names, names))
+        if tags:
+            offsets = EventJournal.filter_offsets(offsets, EventJournal.merge_index(self.tags, tags))
+        return self.read_offsets(offsets)
+
+    def read_offsets(self, offsets) -> []:
+        records = []
+        current_segment = None
+        segment_file = None
+        segment_map = None
+        for offset in offsets:
+            if offset not in self.positions:
+                continue
+            segment, position, length = self.positions[offset]
+            if segment != current_segment:
+                EventJournal.close_map(segment_file, segment_map)
+                segment_file, segment_map = self.open_map(segment)
+                current_segment = segment
+            records.append(json.loads(segment_map[position:position + length]))
+        EventJournal.close_map(segment_file, segment_map)
+        return records
+
+    """
+    Index maintenance
+    """
+
+    def load(self):
+        """
+        Rebuild the index from the segments already on disk so a restarted process can pick up where it left off
+        :return: None
+        """
+        for file_name in sorted(os.listdir(self.directory)):
+            first_offset = file_name[:-len(EventJournal.segment_suffix)]
+            if file_name.endswith(EventJournal.segment_suffix) and first_offset.isdigit():
+                self.segments.append(int(first_offset))
+        self.segments.sort()
+        for segment in self.segments:
+            segment_file, segment_map = self.open_map(segment)
+            if segment_map is None:
+                EventJournal.close_map(segment_file, segment_map)
+                continue
+            position = 0
+            torn_tail = None
+            while position < len(segment_map):
+                end = segment_map.find(b"\n", position)
+                if end == -1:
+                    # partial write from an interrupted process, cut it off so the next append starts a clean line
+                    torn_tail = position
+                    break
+                try:
+                    record = json.loads(segment_map[position:end + 1])
+                except ValueError:
+                    record = None
+                # unreadable line, skip it rather than refuse to open the whole journal
+                if self.is_valid_record(record):
+                    self.index_record(record, segment, position, end + 1 - position)
+                    self.next_offset = record["offset"] + 1
+                position = end + 1
+            EventJournal.close_map(segment_file, segment_map)
+            if torn_tail is not None:
+                os.truncate(self.segment_path(segment), torn_tail)
+        if self.segments:
+            self.next_offset = max(self.next_offset, self.segments[-1])
+            self.open_active()
+        while len(self.segments) > self.max_segments:
+            self.drop_segment()
+
+    def is_valid_record(self, record) -> bool:
+        """
+        Check a loaded record has everything the index needs, and continues the offset order
+        :param record: parsed json line
+        :return: whether the record can be indexed
+        """
+        return (isinstance(record, dict)
+                and type(record.get("offset")) is int and record["offset"] >= self.next_offset
+                and isinstance(record.get("event_name"), str)
+                and isinstance(record.get("tags"), list) and all(isinstance(tag, str) for tag in record["tags"])
+                and isinstance(record.get("time"), (int, float)) and not isinstance(record["time"], bool))
+
+    def index_record(self, record: {}, segment: int, position: int, length: int):
+        offset = record["offset"]
+        self.positions[offset] = (segment, position, length)
+        self.names.setdefault(record["event_name"], []).append(offset)
+        for tag in record["tags"]:
+            self.tags.setdefault(tag, []).append(offset)
+        # records written before a clock step back are clamped so the time index stays sorted
+        self.times.append(max(record["time"], self.times[-1]) if self.times else record["time"])
+        self.time_offsets.append(offset)
+
+    """
+    General supporting function
+    """
+
+    def segment_path(self, first_offset: int) -> str:
+        return os.path.join(self.directory, f"{first_offset:020d}{EventJournal.segment_suffix}")
+
+    def open_map(self, segment: int) -> (any, mmap.mmap):
+        segment_file = open(self.segment_path(segment), "rb")
+        if os.fstat(segment_file.fileno()).st_size == 0:
+            # empty files can't be mapped
+            return segment_file, None
+        return segment_file, mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @staticmethod
+    def close_map(segment_file, segment_map):
+        if segment_map is not None:
+            segment_map.close()
+        if segment_file is not None:
+            segment_file.close()
+
+    @staticmethod
+    def merge_index(index: {}, keys: []) -> []:
+        offsets = set()
+        for key in keys:
+            offsets.update(index.get(key, []))
+        return sorted(offsets)
+
+    @staticmethod
+    def filter_offsets(offsets, allowed: []) -> []:
+        """
+        Keep the offsets that are also in the sorted allowed list
+        """
+        if isinstance(offsets, range):
+            low = bisect_left(allowed, offsets.start)
+            high = bisect_right(allowed, offsets.stop - 1) if len(offsets) else low
+            return allowed[low:high]
+        allowed = set(allowed)
+        return [offset for offset in offsets if offset in allowed]
+
+    @staticmethod
+    def message_to_record(message: EventMessage, tags: []) -> {}:
+        return {
+            "id": str(message.id),
+            "event_name": message.event_name,
+            "tags": tags,
+            "caller": message.caller,
+            "success": message.success,
+            "data": message.data,
+            "exception": str(message.exception) if message.exception else None,
+            "inner_event_name": message.inner_message.event_name if message.inner_message else None,
+        }
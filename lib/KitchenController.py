@@ -3,6 +3,7 @@ import json
 import Kitchen.Kitchen
 
 from Events import *
+from Journal import *
 from os.path import exists
 
 
@@ -10,9 +11,12 @@ class KitchenController:
     command_file_path = "../Data/kitchen_commands"
     state_file_path = "../Data/kitchen_state"
 
-    def __init__(self):
+    def __init__(self, journal_directory: str = None):
         self.events = []
         self.create_events()
+        self.journal = None
+        if journal_directory:
+            self.create_journal(journal_directory)
 
     def create_events(self):
         """
@@ -74,6 +78,26 @@ class KitchenController:
 
         self.events.append(e_master)
 
+    def create_journal(self, journal_directory: str):
+        """
+        Record every event of this controller in an on disk journal so late subscribers can replay history. The master
+        event is left out since it only repeats what the other events already recorded
+        :param journal_directory: directory holding the journal segments
+        :return:
+        """
+        self.journal = EventJournal(journal_directory)
+        for event in self.events:
+            if event.name != "master":
+                self.journal.attach(event)
+
+    def close(self):
+        """
+        Shut down the controller, closing the event journal if there is one
+        :return:
+        """
+        if self.journal:
+            self.journal.close()
+
     def subscribe_to_events(self, callback: EventCallback, tags=[], names=[]):
         for tag in tags:
             events = (e for e in self.events if tag in e.tags)